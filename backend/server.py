@@ -1,7 +1,13 @@
 from fastapi import FastAPI, APIRouter, HTTPException
+from fastapi.responses import ORJSONResponse, Response
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
-from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import ReturnDocument, UpdateOne
+from pymongo.errors import BulkWriteError, DuplicateKeyError, PyMongoError, WriteError
+from redis.asyncio import Redis
+from redis.exceptions import RedisError
+import orjson
+import asyncio
 import os
 import logging
 from pathlib import Path
@@ -14,13 +20,63 @@ from enum import Enum
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
 
+# MongoDB connection pool sizing. Motor runs every operation on a thread pool that is
+# sized from MOTOR_MAX_WORKERS at import time, so match it to the connection pool. This
+# has to happen after loading .env and before importing motor.
+MONGO_MAX_POOL_SIZE = 50
+MONGO_MIN_POOL_SIZE = 10
+os.environ.setdefault('MOTOR_MAX_WORKERS', str(MONGO_MAX_POOL_SIZE))
+
+from motor.motor_asyncio import AsyncIOMotorClient  # noqa: E402
+
+# Aliases for the id/timestamp defaults computed on every request
+_UTC = timezone.utc
+_now = datetime.now
+_uuid4 = uuid.uuid4
+
+def _utcnow_ms():
+    """Current UTC time truncated to milliseconds, the precision BSON dates store"""
+    now = _now(_UTC)
+    return now.replace(microsecond=now.microsecond // 1000 * 1000)
+
 # MongoDB connection
 mongo_url = os.environ['MONGO_URL']
-client = AsyncIOMotorClient(mongo_url)
+client = AsyncIOMotorClient(
+    mongo_url,
+    maxPoolSize=MONGO_MAX_POOL_SIZE,
+    minPoolSize=MONGO_MIN_POOL_SIZE,
+    maxIdleTimeMS=60000,
+    waitQueueTimeoutMS=2000,
+    tz_aware=True,
+    uuidRepresentation='standard'
+)
 db = client[os.environ['DB_NAME']]
 
+# Redis connection (materialized leaderboards)
+# Short timeouts so an unreachable Redis falls back to MongoDB instead of hanging requests
+redis_client = Redis.from_url(
+    os.environ.get('REDIS_URL', 'redis://localhost:6379/0'),
+    socket_connect_timeout=0.5,
+    socket_timeout=0.5
+)
+LEADERBOARD_KEYS = {"consecutive_wins": "leaderboard:cw", "best_streak": "leaderboard:streak"}
+LEADERBOARD_REFRESH_INTERVAL = 30  # in seconds
+LEADERBOARD_REFRESH_DELAY = 2.0  # in seconds
+
+# Pending coalesced leaderboard refresh, and references to background tasks
+_leaderboard_refresh: Optional[asyncio.TimerHandle] = None
+_background_tasks = set()
+
+# Incoming games, written to MongoDB in batches by a background drainer
+GAME_BATCH_MAX_SIZE = 100
+_game_queue: Optional[asyncio.Queue] = None
+
+# Health check timestamp, refreshed by a background task instead of per request
+HEALTH_CLOCK_INTERVAL = 1.0  # in seconds
+_cached_timestamp = _now(_UTC).isoformat()
+
 # Create the main app without a prefix
-app = FastAPI()
+app = FastAPI(default_response_class=ORJSONResponse)
 
 # Create a router with the /api prefix
 api_router = APIRouter(prefix="/api")
@@ -37,13 +93,13 @@ class BotDifficulty(str, Enum):
 
 # Game Models
 class Player(BaseModel):
-    id: str = Field(default_factory=lambda: str(uuid.uuid4()))
+    id: uuid.UUID = Field(default_factory=_uuid4)
     name: str
     consecutive_wins: int = 0
     best_streak: int = 0
     total_games: int = 0
     total_wins: int = 0
-    created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+    created_at: datetime = Field(default_factory=_utcnow_ms)
 
 class PlayerCreate(BaseModel):
     name: str
@@ -56,7 +112,7 @@ class PlayerUpdate(BaseModel):
     total_wins: Optional[int] = None
 
 class GameSession(BaseModel):
-    id: str = Field(default_factory=lambda: str(uuid.uuid4()))
+    id: uuid.UUID = Field(default_factory=_uuid4)
     mode: GameMode
     player1_name: str
     player2_name: Optional[str] = None  # None for bot games
@@ -65,7 +121,7 @@ class GameSession(BaseModel):
     player2_score: int
     bot_difficulty: Optional[BotDifficulty] = None
     game_duration: int  # in seconds
-    created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+    created_at: datetime = Field(default_factory=_utcnow_ms)
 
 class GameSessionCreate(BaseModel):
     mode: GameMode
@@ -84,138 +140,253 @@ class LeaderboardEntry(BaseModel):
     total_games: int
     total_wins: int
 
+# Only fetch the fields a leaderboard entry exposes
+LEADERBOARD_PROJECTION = {"_id": 0, **{field: 1 for field in LeaderboardEntry.model_fields}}
+
 # Helper functions
-def prepare_for_mongo(data):
-    """Prepare datetime objects for MongoDB storage"""
-    if isinstance(data, dict):
-        for key, value in data.items():
-            if isinstance(value, datetime):
-                data[key] = value.isoformat()
-    return data
-
-def parse_from_mongo(item):
-    """Parse datetime strings from MongoDB"""
-    if isinstance(item, dict):
-        for key, value in item.items():
-            if key in ['created_at'] and isinstance(value, str):
-                try:
-                    item[key] = datetime.fromisoformat(value)
-                except:
-                    item[key] = datetime.now(timezone.utc)
-    return item
+def start_background_task(coro):
+    """Run a coroutine in the background, keeping a reference so it isn't garbage collected"""
+    task = asyncio.create_task(coro)
+    _background_tasks.add(task)
+    task.add_done_callback(_background_tasks.discard)
+    return task
+
+async def fetch_leaderboard(sort_field: str) -> Response:
+    """Serve a top-10 leaderboard from its Redis sorted set, falling back to MongoDB"""
+    try:
+        entries = await redis_client.zrevrange(LEADERBOARD_KEYS[sort_field], 0, 9)
+    except RedisError as e:
+        logger.warning(f"Leaderboard read from Redis failed: {e}")
+        entries = None
+    if entries:
+        # Members are already serialized entries
+        return Response(content=b"[" + b",".join(entries) + b"]", media_type="application/json")
+
+    players = await db.players.find({}, LEADERBOARD_PROJECTION).sort(sort_field, -1).limit(10).to_list(10)
+    return ORJSONResponse(players)
+
+async def refresh_leaderboards():
+    """Materialize the top-10 of each leaderboard into a Redis sorted set"""
+    for sort_field, key in LEADERBOARD_KEYS.items():
+        try:
+            players = await db.players.find({}, LEADERBOARD_PROJECTION).sort(sort_field, -1).limit(10).to_list(10)
+            async with redis_client.pipeline(transaction=True) as pipe:
+                pipe.delete(key)
+                if players:
+                    pipe.zadd(key, {orjson.dumps(player): player.get(sort_field, 0) for player in players})
+                    # Let a stale leaderboard lapse to the MongoDB fallback if refreshes stop
+                    pipe.expire(key, 2 * LEADERBOARD_REFRESH_INTERVAL)
+                await pipe.execute()
+        except (PyMongoError, RedisError) as e:
+            logger.warning(f"Leaderboard refresh for {sort_field} failed: {e}")
+
+async def refresh_leaderboard_loop():
+    """Periodically rebuild the materialized leaderboards"""
+    while True:
+        try:
+            await refresh_leaderboards()
+        except Exception:
+            logger.exception("Leaderboard refresh failed")
+        await asyncio.sleep(LEADERBOARD_REFRESH_INTERVAL)
+
+def schedule_leaderboard_refresh():
+    """Coalesce refreshes after stats change so a burst of games only rebuilds the leaderboards once"""
+    global _leaderboard_refresh
+    if _leaderboard_refresh is not None:
+        return
+    loop = asyncio.get_running_loop()
+    _leaderboard_refresh = loop.call_later(LEADERBOARD_REFRESH_DELAY, _run_leaderboard_refresh)
+
+def _run_leaderboard_refresh():
+    global _leaderboard_refresh
+    _leaderboard_refresh = None
+    start_background_task(refresh_leaderboards())
+
+async def refresh_cached_timestamp():
+    """Keep the health check timestamp current"""
+    global _cached_timestamp
+    while True:
+        _cached_timestamp = _now(_UTC).isoformat()
+        await asyncio.sleep(HEALTH_CLOCK_INTERVAL)
 
 # Player Routes
-@api_router.post("/players", response_model=Player)
+@api_router.post("/players", responses={200: {"model": Player}})
 async def create_player(player_data: PlayerCreate):
-    # Check if player already exists
-    existing_player = await db.players.find_one({"name": player_data.name})
-    if existing_player:
-        return Player(**parse_from_mongo(existing_player))
-    
-    player = Player(**player_data.dict())
-    player_dict = prepare_for_mongo(player.dict())
-    await db.players.insert_one(player_dict)
-    return player
+    # Insert the player only if it doesn't exist yet, returning the stored document either way
+    player = Player(**player_data.model_dump())
+    player_dict = player.model_dump(exclude={"name"})
+    stored_player = await db.players.find_one_and_update(
+        {"name": player_data.name},
+        {"$setOnInsert": player_dict},
+        projection={"_id": 0},
+        upsert=True,
+        return_document=ReturnDocument.AFTER
+    )
+    return ORJSONResponse(stored_player)
 
-@api_router.get("/players/{player_name}", response_model=Player)
+@api_router.get("/players/{player_name}", responses={200: {"model": Player}})
 async def get_player(player_name: str):
-    player = await db.players.find_one({"name": player_name})
+    player = await db.players.find_one({"name": player_name}, {"_id": 0})
     if not player:
         raise HTTPException(status_code=404, detail="Player not found")
-    return Player(**parse_from_mongo(player))
+    return ORJSONResponse(player)
 
-@api_router.put("/players/{player_name}", response_model=Player)
+@api_router.put("/players/{player_name}", responses={200: {"model": Player}})
 async def update_player(player_name: str, updates: PlayerUpdate):
-    update_data = {k: v for k, v in updates.dict().items() if v is not None}
+    update_data = updates.model_dump(exclude_none=True)
     if not update_data:
         raise HTTPException(status_code=400, detail="No valid updates provided")
     
-    result = await db.players.update_one(
-        {"name": player_name},
-        {"$set": update_data}
-    )
+    # Apply the update and get the previous document back in one round-trip
+    try:
+        player = await db.players.find_one_and_update(
+            {"name": player_name},
+            {"$set": update_data},
+            projection={"_id": 0},
+            return_document=ReturnDocument.BEFORE
+        )
+    except DuplicateKeyError:
+        raise HTTPException(status_code=409, detail="Player name already taken")
     
-    if result.matched_count == 0:
+    if player is None:
         raise HTTPException(status_code=404, detail="Player not found")
     
-    updated_player = await db.players.find_one({"name": player_name})
-    return Player(**parse_from_mongo(updated_player))
+    # Only rebuild leaderboards when something actually changed
+    if any(player.get(key) != value for key, value in update_data.items()):
+        schedule_leaderboard_refresh()
+        player.update(update_data)
+    return ORJSONResponse(player)
 
 @api_router.get("/leaderboard", response_model=List[LeaderboardEntry])
 async def get_leaderboard():
-    players = await db.players.find().sort("consecutive_wins", -1).limit(10).to_list(10)
-    return [LeaderboardEntry(**parse_from_mongo(player)) for player in players]
+    return await fetch_leaderboard("consecutive_wins")
 
 @api_router.get("/leaderboard/best-streaks", response_model=List[LeaderboardEntry])
 async def get_best_streaks_leaderboard():
-    players = await db.players.find().sort("best_streak", -1).limit(10).to_list(10)
-    return [LeaderboardEntry(**parse_from_mongo(player)) for player in players]
+    return await fetch_leaderboard("best_streak")
 
 # Game Session Routes
-@api_router.post("/games", response_model=GameSession)
+@api_router.post("/games", responses={200: {"model": GameSession}})
 async def create_game_session(game_data: GameSessionCreate):
-    game = GameSession(**game_data.dict())
-    game_dict = prepare_for_mongo(game.dict())
-    await db.game_sessions.insert_one(game_dict)
-    
-    # Update player stats
-    await update_player_stats(game_data.player1_name, game_data.winner == game_data.player1_name)
-    if game_data.player2_name:
-        await update_player_stats(game_data.player2_name, game_data.winner == game_data.player2_name)
-    
-    return game
+    game = GameSession(**game_data.model_dump())
+    await record_game(game)
+    return ORJSONResponse(game.model_dump())
 
-async def update_player_stats(player_name: str, won: bool):
-    """Update player statistics after a game"""
-    player = await db.players.find_one({"name": player_name})
-    if not player:
-        # Create player if doesn't exist
-        new_player = Player(
-            name=player_name,
-            consecutive_wins=1 if won else 0,
-            best_streak=1 if won else 0,
-            total_games=1,
-            total_wins=1 if won else 0
-        )
-        await db.players.insert_one(prepare_for_mongo(new_player.dict()))
-        return
-    
-    # Update existing player
-    total_games = player.get('total_games', 0) + 1
-    total_wins = player.get('total_wins', 0) + (1 if won else 0)
-    consecutive_wins = player.get('consecutive_wins', 0)
-    best_streak = player.get('best_streak', 0)
-    
-    if won:
-        consecutive_wins += 1
-        if consecutive_wins > best_streak:
-            best_streak = consecutive_wins
-    else:
-        consecutive_wins = 0
+@api_router.post("/games/batch", responses={200: {"model": List[GameSession]}})
+async def create_game_sessions(games_data: List[GameSessionCreate]):
+    games = [GameSession(**game_data.model_dump()) for game_data in games_data]
+    await asyncio.gather(*(record_game(game) for game in games))
+    return ORJSONResponse([game.model_dump() for game in games])
+
+async def record_game(game: GameSession):
+    """Queue a game for the batch writer and wait until it is stored"""
+    future = asyncio.get_running_loop().create_future()
+    await _game_queue.put((game, future))
+    await future
+
+async def drain_game_queue():
+    """Write queued games as they arrive, batching whatever piled up during the previous write"""
+    while True:
+        batch = [await _game_queue.get()]
+        while not _game_queue.empty() and len(batch) < GAME_BATCH_MAX_SIZE:
+            batch.append(_game_queue.get_nowait())
+        try:
+            write_errors = await write_games([game for game, _ in batch])
+        except Exception as e:
+            # Unknown outcome for the whole batch
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            continue
+        # Only the games whose own writes failed get an error
+        for index, (_, future) in enumerate(batch):
+            if future.done():
+                continue
+            if index in write_errors:
+                error = write_errors[index]
+                future.set_exception(WriteError(error.get("errmsg"), error.get("code"), error))
+            else:
+                future.set_result(None)
+
+async def write_games(games: List[GameSession]) -> dict:
+    """Insert games and update player stats, one round-trip per collection when nothing fails
+
+    Returns the write error of each failed game, keyed by its index in games.
+    """
+    failed_inserts, failed_stats = await asyncio.gather(insert_games(games), update_games_stats(games))
+    schedule_leaderboard_refresh()
+    return {**failed_inserts, **failed_stats}
+
+async def insert_games(games: List[GameSession]) -> dict:
+    """Insert games, returning the write error of each game that couldn't be inserted"""
+    try:
+        await db.game_sessions.insert_many([game.model_dump() for game in games], ordered=False)
+    except BulkWriteError as e:
+        if not e.details["writeErrors"]:
+            raise
+        return {error["index"]: error for error in e.details["writeErrors"]}
+    return {}
+
+async def update_games_stats(games: List[GameSession]) -> dict:
+    """Apply player stats for games in order, returning the write error of each game whose update failed"""
+    stats_updates = []
+    owners = []  # index of the game each stats update belongs to
+    for index, game in enumerate(games):
+        stats_updates.append(player_stats_update(game.player1_name, game.winner == game.player1_name))
+        owners.append(index)
+        if game.player2_name:
+            stats_updates.append(player_stats_update(game.player2_name, game.winner == game.player2_name))
+            owners.append(index)
     
-    await db.players.update_one(
+    # Stats updates stay ordered so streaks are applied in game order when a player appears twice.
+    # An ordered bulk write stops at the first error, so resume right after the failed update.
+    failed = {}
+    start = 0
+    while start < len(stats_updates):
+        try:
+            await db.players.bulk_write(stats_updates[start:], ordered=True)
+            break
+        except BulkWriteError as e:
+            if not e.details["writeErrors"]:
+                raise
+            error = e.details["writeErrors"][0]
+            position = start + error["index"]
+            failed.setdefault(owners[position], error)
+            start = position + 1
+    return failed
+
+def player_stats_update(player_name: str, won: bool) -> UpdateOne:
+    """Build the atomic upsert that updates player statistics after a game"""
+    return UpdateOne(
         {"name": player_name},
-        {"$set": {
-            "consecutive_wins": consecutive_wins,
-            "best_streak": best_streak,
-            "total_games": total_games,
-            "total_wins": total_wins
-        }}
+        [
+            {"$set": {
+                "id": {"$ifNull": ["$id", _uuid4()]},
+                "created_at": {"$ifNull": ["$created_at", _utcnow_ms()]},
+                "total_games": {"$add": [{"$ifNull": ["$total_games", 0]}, 1]},
+                "total_wins": {"$add": [{"$ifNull": ["$total_wins", 0]}, 1 if won else 0]},
+                "consecutive_wins": {"$add": [{"$ifNull": ["$consecutive_wins", 0]}, 1]} if won else 0
+            }},
+            {"$set": {
+                "best_streak": {"$max": [{"$ifNull": ["$best_streak", 0]}, "$consecutive_wins"]}
+            }}
+        ],
+        upsert=True
     )
 
-@api_router.get("/games", response_model=List[GameSession])
+@api_router.get("/games", responses={200: {"model": List[GameSession]}})
 async def get_recent_games():
-    games = await db.game_sessions.find().sort("created_at", -1).limit(20).to_list(20)
-    return [GameSession(**parse_from_mongo(game)) for game in games]
+    games = await db.game_sessions.find({}, {"_id": 0}).sort("created_at", -1).limit(20).to_list(20)
+    return ORJSONResponse(games)
 
 # Basic status routes
 @api_router.get("/")
 async def root():
     return {"message": "Ping Pong Game API is running!"}
 
-@api_router.get("/health")
+@api_router.get("/health", response_class=ORJSONResponse)
 async def health_check():
-    return {"status": "healthy", "timestamp": datetime.now(timezone.utc)}
+    return ORJSONResponse({"status": "healthy", "timestamp": _cached_timestamp})
 
 # Include the router in the main app
 app.include_router(api_router)
@@ -235,6 +406,30 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+@app.on_event("startup")
+async def create_indexes():
+    try:
+        await db.players.create_index("name", unique=True)
+    except DuplicateKeyError as e:
+        # Older versions could store the same name twice; those players must be merged by hand
+        logger.error(f"Unique index on players.name not created, duplicate player names exist: {e}")
+    await db.players.create_index([("consecutive_wins", -1)])
+    await db.players.create_index([("best_streak", -1)])
+    await db.game_sessions.create_index([("created_at", -1)])
+
+@app.on_event("startup")
+async def start_background_loops():
+    global _game_queue
+    _game_queue = asyncio.Queue()
+    start_background_task(drain_game_queue())
+    start_background_task(refresh_cached_timestamp())
+    start_background_task(refresh_leaderboard_loop())
+
 @app.on_event("shutdown")
 async def shutdown_db_client():
-    client.close()
\ No newline at end of file
+    if _leaderboard_refresh is not None:
+        _leaderboard_refresh.cancel()
+    for task in list(_background_tasks):
+        task.cancel()
+    client.close()
+    await redis_client.aclose()
\ No newline at end of file
@@ -1,6 +1,7 @@
-import requests
+import asyncio
+import httpx
 import sys
-import json
+import orjson
 from datetime import datetime
 
 class PingPongAPITester:
@@ -10,6 +11,7 @@ class PingPongAPITester:
         self.tests_run = 0
         self.tests_passed = 0
         self.test_results = []
+        self.client = None
 
     def log_test(self, name, success, details=""):
         """Log test result"""
@@ -26,10 +28,10 @@ class PingPongAPITester:
             "details": details
         })
 
-    def test_health_check(self):
+    async def test_health_check(self):
         """Test basic API health"""
         try:
-            response = requests.get(f"{self.api_url}/health", timeout=10)
+            response = await self.client.get("/health", timeout=10)
             success = response.status_code == 200
             details = f"Status: {response.status_code}"
             if success:
@@ -41,10 +43,10 @@ class PingPongAPITester:
             self.log_test("Health Check", False, str(e))
             return False
 
-    def test_root_endpoint(self):
+    async def test_root_endpoint(self):
         """Test root API endpoint"""
         try:
-            response = requests.get(f"{self.api_url}/", timeout=10)
+            response = await self.client.get("/", timeout=10)
             success = response.status_code == 200
             details = f"Status: {response.status_code}"
             if success:
@@ -56,11 +58,11 @@ class PingPongAPITester:
             self.log_test("Root Endpoint", False, str(e))
             return False
 
-    def test_create_player(self, player_name="TestPlayer"):
+    async def test_create_player(self, player_name="TestPlayer"):
         """Test player creation"""
         try:
             payload = {"name": player_name}
-            response = requests.post(f"{self.api_url}/players", json=payload, timeout=10)
+            response = await self.client.post("/players", json=payload, timeout=10)
             success = response.status_code == 200
             details = f"Status: {response.status_code}"
             
@@ -77,10 +79,10 @@ class PingPongAPITester:
             self.log_test("Create Player", False, str(e))
             return None
 
-    def test_get_player(self, player_name):
+    async def test_get_player(self, player_name):
         """Test getting player by name"""
         try:
-            response = requests.get(f"{self.api_url}/players/{player_name}", timeout=10)
+            response = await self.client.get(f"/players/{player_name}", timeout=10)
             success = response.status_code == 200
             details = f"Status: {response.status_code}"
             
@@ -96,7 +98,7 @@ class PingPongAPITester:
             self.log_test("Get Player", False, str(e))
             return False
 
-    def test_create_game_session(self):
+    async def test_create_game_session(self):
         """Test game session creation"""
         try:
             game_data = {
@@ -110,7 +112,7 @@ class PingPongAPITester:
                 "game_duration": 120
             }
             
-            response = requests.post(f"{self.api_url}/games", json=game_data, timeout=10)
+            response = await self.client.post("/games", json=game_data, timeout=10)
             success = response.status_code == 200
             details = f"Status: {response.status_code}"
             
@@ -126,10 +128,10 @@ class PingPongAPITester:
             self.log_test("Create Game Session", False, str(e))
             return False
 
-    def test_get_recent_games(self):
+    async def test_get_recent_games(self):
         """Test getting recent games"""
         try:
-            response = requests.get(f"{self.api_url}/games", timeout=10)
+            response = await self.client.get("/games", timeout=10)
             success = response.status_code == 200
             details = f"Status: {response.status_code}"
             
@@ -147,11 +149,11 @@ class PingPongAPITester:
             self.log_test("Get Recent Games", False, str(e))
             return False
 
-    def test_leaderboard(self):
+    async def test_leaderboard(self):
         """Test leaderboard endpoints"""
         try:
             # Test consecutive wins leaderboard
-            response = requests.get(f"{self.api_url}/leaderboard", timeout=10)
+            response = await self.client.get("/leaderboard", timeout=10)
             success1 = response.status_code == 200
             details1 = f"Consecutive wins - Status: {response.status_code}"
             
@@ -162,7 +164,7 @@ class PingPongAPITester:
                     details1 += f", Top player: {data[0].get('name', 'No name')} ({data[0].get('consecutive_wins', 0)} wins)"
             
             # Test best streaks leaderboard
-            response2 = requests.get(f"{self.api_url}/leaderboard/best-streaks", timeout=10)
+            response2 = await self.client.get("/leaderboard/best-streaks", timeout=10)
             success2 = response2.status_code == 200
             details2 = f"Best streaks - Status: {response2.status_code}"
             
@@ -181,11 +183,11 @@ class PingPongAPITester:
             self.log_test("Leaderboard Endpoints", False, str(e))
             return False
 
-    def test_multiplayer_game(self):
+    async def test_multiplayer_game(self):
         """Test multiplayer game session"""
         try:
             # Create second player
-            player2_data = self.test_create_player("TestPlayer2")
+            player2_data = await self.test_create_player("TestPlayer2")
             if not player2_data:
                 self.log_test("Multiplayer Game Setup", False, "Failed to create second player")
                 return False
@@ -202,7 +204,7 @@ class PingPongAPITester:
                 "game_duration": 180
             }
             
-            response = requests.post(f"{self.api_url}/games", json=game_data, timeout=10)
+            response = await self.client.post("/games", json=game_data, timeout=10)
             success = response.status_code == 200
             details = f"Status: {response.status_code}"
             
@@ -218,34 +220,83 @@ class PingPongAPITester:
             self.log_test("Multiplayer Game Session", False, str(e))
             return False
 
-    def run_all_tests(self):
+    async def test_batch_games(self):
+        """Test batch game session creation"""
+        try:
+            games_data = [
+                {
+                    "mode": "single_player",
+                    "player1_name": "TestPlayer",
+                    "player2_name": None,
+                    "winner": "TestPlayer",
+                    "player1_score": 5,
+                    "player2_score": 2,
+                    "bot_difficulty": "easy",
+                    "game_duration": 90
+                },
+                {
+                    "mode": "multiplayer",
+                    "player1_name": "TestPlayer",
+                    "player2_name": "TestPlayer2",
+                    "winner": "TestPlayer",
+                    "player1_score": 5,
+                    "player2_score": 4,
+                    "bot_difficulty": None,
+                    "game_duration": 150
+                }
+            ]
+            
+            response = await self.client.post("/games/batch", json=games_data, timeout=10)
+            success = response.status_code == 200
+            details = f"Status: {response.status_code}"
+            
+            if success:
+                data = response.json()
+                success = len(data) == len(games_data)
+                details += f", Games created: {len(data)}"
+            else:
+                details += f", Error: {response.text}"
+                
+            self.log_test("Batch Game Sessions", success, details)
+            return success
+        except Exception as e:
+            self.log_test("Batch Game Sessions", False, str(e))
+            return False
+
+    async def run_all_tests(self):
         """Run comprehensive API tests"""
         print("🏓 Starting Ping Pong API Tests...")
         print("=" * 50)
         
-        # Basic connectivity tests
-        if not self.test_health_check():
-            print("❌ Health check failed - API may be down")
-            return False
+        async with httpx.AsyncClient(base_url=self.api_url, http2=True) as client:
+            self.client = client
             
-        if not self.test_root_endpoint():
-            print("❌ Root endpoint failed")
-            return False
-        
-        # Player management tests
-        player_data = self.test_create_player("TestPlayer")
-        if player_data:
-            self.test_get_player("TestPlayer")
-        
-        # Game session tests
-        self.test_create_game_session()
-        self.test_get_recent_games()
-        
-        # Leaderboard tests
-        self.test_leaderboard()
-        
-        # Multiplayer tests
-        self.test_multiplayer_game()
+            # Basic connectivity tests
+            health_ok, root_ok = await asyncio.gather(self.test_health_check(), self.test_root_endpoint())
+            if not health_ok:
+                print("❌ Health check failed - API may be down")
+                return False
+                
+            if not root_ok:
+                print("❌ Root endpoint failed")
+                return False
+            
+            # Player management tests
+            player_data = await self.test_create_player("TestPlayer")
+            if player_data:
+                await self.test_get_player("TestPlayer")
+            
+            # Game session tests
+            await self.test_create_game_session()
+            
+            # Recent games and leaderboard tests are read-only and independent
+            await asyncio.gather(self.test_get_recent_games(), self.test_leaderboard())
+            
+            # Multiplayer tests
+            await self.test_multiplayer_game()
+            
+            # Batch game tests
+            await self.test_batch_games()
         
         # Print summary
         print("\n" + "=" * 50)
@@ -262,19 +313,19 @@ class PingPongAPITester:
 
 def main():
     tester = PingPongAPITester()
-    success = tester.run_all_tests()
+    success = asyncio.run(tester.run_all_tests())
     
     # Save detailed results
     results = {
-        "timestamp": datetime.now().isoformat(),
+        "timestamp": datetime.now(),
         "total_tests": tester.tests_run,
         "passed_tests": tester.tests_passed,
         "success_rate": (tester.tests_passed / tester.tests_run) * 100 if tester.tests_run > 0 else 0,
         "test_details": tester.test_results
     }
     
-    with open('/app/backend_test_results.json', 'w') as f:
-        json.dump(results, f, indent=2)
+    with open('/app/backend_test_results.json', 'wb') as f:
+        f.write(orjson.dumps(results, option=orjson.OPT_INDENT_2))
     
     return 0 if success else 1
 